@@ -1,101 +1,277 @@
-import mesa
 import numpy as np
 import logging
 import pandas as pd
 from mesa import DataCollector
-import random
+from kernels import job_offer_update, price_update, produce_kernel, work_kernel
 
+log = logging.getLogger(__name__)
 
-def get_distance(pos1, pos2):
-    """计算两个位置之间的曼哈顿距离"""
-    return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
 
+# 三组实验的参数，simulate.py / simulate_period.py / simulate_perfectly.py
+# 分别用CrisisModel(variant=...)选用其中一组
+VARIANTS = {
+    # 市场自发调节，观察经济危机的产生
+    "crisis": {
+        "happiness": 50,  # 工人初始幸福值
+        "living_cost": 1,  # 每天必需品的开销
+        "max_need": 2,  # 每天最多想买的产品数
+        "out_of_stock_penalty": 9,  # 买不到产品时幸福值的下降
+        "unaffordable_penalty": 5,  # 买不起产品时幸福值的下降
+        "rich_workers_quit": False,  # 太有钱的工人在月初辞职
+        "wage": 50,
+        "job_offer": 40,
+        "adjust_production": True,  # 工厂每月按销量调整岗位
+        "update_prices": True,  # 市场每天按供需调整价格
+        "intervention": "reset_prices",  # Government.intervene采取的政策
+        "intervention_interval": None,  # 政府每隔多少天干预一次，None表示不干预
+        "report_phase": True,  # 每天在日志里报告经济周期阶段
+    },
+    # 政府定期干预，观察危机的周期性
+    "period": {
+        "happiness": 50,
+        "living_cost": 2,
+        "max_need": 2,
+        "out_of_stock_penalty": 9,
+        "unaffordable_penalty": 5,
+        "rich_workers_quit": False,
+        "wage": 15,
+        "job_offer": 40,
+        "adjust_production": True,
+        "update_prices": True,
+        "intervention": "reset_market",
+        "intervention_interval": 75,
+        "report_phase": False,
+    },
+    # 工资和价格固定的对照组
+    "perfect": {
+        "happiness": 10,
+        "living_cost": 1,
+        "max_need": 3,
+        "out_of_stock_penalty": 1,
+        "unaffordable_penalty": 1,
+        "rich_workers_quit": True,
+        "wage": 40,
+        "job_offer": 50,
+        "adjust_production": False,
+        "update_prices": False,
+        "intervention": "stimulus",
+        "intervention_interval": None,
+        "report_phase": True,
+    },
+}
 
-class Worker(mesa.Agent):
-    def __init__(self, unique_id, model, pos):
-        super().__init__(unique_id, model)
-        self.home_pos = pos
-        self.wealth = random.randint(0, 10)  # 初始有100块积蓄
-        self.relative_wealth = 5
-        self.employed = False  # 初始没有工作
-        self.work_duration = 8  # 工作时长
-        self.factory = None
-        self.happiness = 50  # 幸福值
-        self.consumption_cycle = 1
-        self.last_consumption = 0
 
-    def __str__(self):
-        return f"Worker {self.unique_id}: Wealth={self.wealth:.1f}, Employed={self.employed}"
+def _skip():
+    """被关闭的行为用它占位"""
+
+
+def manhattan_batch(positions, q):
+    """计算一组位置（N×2数组）到q的曼哈顿距离"""
+    positions = np.asarray(positions)
+    return np.abs(positions[:, 0] - q[0]) + np.abs(positions[:, 1] - q[1])
+
+
+def _column(name):
+    """把WorkerPool中的一列暴露成Worker的属性"""
+
+    def fget(self):
+        return getattr(self.pool, name)[self.idx]
+
+    def fset(self, value):
+        getattr(self.pool, name)[self.idx] = value
+
+    return property(fget, fset)
+
+
+class WorkerPool:
+    """所有工人的状态按列存放在NumPy数组里，每天对全体工人做一次向量化更新"""
+
+    def __init__(self, model, n):
+        params = VARIANTS[model.variant]
+        self.model = model
+        self.n = n
+        self.rng = model.rng
+        # 各列都是连续的一维数组，numba内核和NumPy归约都按C顺序访问
+        self.wealth = self.rng.integers(0, 10, size=n, endpoint=True).astype(np.float64)
+        self.relative_wealth = np.full(n, 5.0)
+        self.employed = np.zeros(n, dtype=np.bool_)  # 初始没有工作
+        self.work_duration = np.full(n, 8, dtype=np.int8)  # 工作时长
+        self.purchases = np.zeros(n, dtype=np.int64)  # 当天每个工人买到的产品数
+        self.happiness = np.full(n, params["happiness"], dtype=np.float32)  # 幸福值
+        self.living_cost = params["living_cost"]
+        self.max_need = params["max_need"]
+        self.out_of_stock_penalty = params["out_of_stock_penalty"]
+        self.unaffordable_penalty = params["unaffordable_penalty"]
+        # 按实验设定绑定具体行为，每天的step里不用再判断
+        if params["rich_workers_quit"]:
+            self.choose_factory = self._choose_factory_or_quit
+        else:
+            self.choose_factory = self._choose_factory
 
-    def choose_factory(self):
-        if self.model.schedule.steps % 30 != 0 and self.employed:
+    def _choose_factory(self):
+        factory = self.model.factory
+        # 工厂不招人或者所有工人都有工作时，没有人需要做决定
+        if not factory.hiring or len(factory.workers) == self.n:
             return
+        # 已经有工作的工人保留原来的工作，只有失业的工人去应聘
+        self._hire(factory, np.flatnonzero(~self.employed))
 
-        if not self.model.factory.hiring:
-            if self.employed:
-                logging.debug(f"Worker {self.unique_id} keep job.")
-                return
-            if not self.employed:
-                logging.debug(f"Worker {self.unique_id} found no hiring factories")
-                return
+    def _choose_factory_or_quit(self):
+        factory = self.model.factory
+        month_boundary = self.model.is_month_boundary
+        # 不是月初时只有失业工人会去应聘，工厂不招人或没人失业就直接返回
+        if not month_boundary and (
+            not factory.hiring or len(factory.workers) == self.n
+        ):
+            return
+        too_rich = self.wealth > 900
+        if month_boundary:
+            # 太有钱的工人在聘期结束时辞职
+            workers = self.model.workers
+            quitters = np.flatnonzero(self.employed & too_rich)
+            self.employed[quitters] = False
+            debug = log.isEnabledFor(logging.DEBUG)
+            for i in quitters:
+                worker = workers[i]
+                if debug:
+                    log.debug(
+                        "Worker %s is too rich to work, wealth: %.1f",
+                        worker.unique_id,
+                        worker.wealth,
+                    )
+                factory.remove_worker(worker)
+        if not factory.hiring:
             return
-        self.employed = True
-        self.factory = self.model.factory
-        self.factory.workers.append(self)
-        self.factory.hiring = self.factory.job_offer - len(self.factory.workers) > 0
+        # 已经有工作的工人保留原来的工作，太有钱的工人不去应聘
+        self._hire(factory, np.flatnonzero(~self.employed & ~too_rich))
 
-    def work(self):
-        if not self.employed:
-            self.happiness += 3
+    def _hire(self, factory, candidates):
+        if candidates.size == 0:
             return
-        self.happiness -= 1
-        self.work_duration = 8
-        self.work_duration = np.clip(self.work_duration, 4, 16)
+        openings = max(1, factory.job_offer - len(factory.workers))
+        hired = candidates[:openings]
+        self.employed[hired] = True
+        workers = self.model.workers
+        for i in hired:
+            worker = workers[i]
+            worker.factory = factory
+            factory.add_worker(worker)
+        factory.hiring = factory.job_offer - len(factory.workers) > 0
 
-        # 获得收入
-        income = self.factory.wage
-        self.wealth += income
+    def work(self):
+        work_kernel(
+            self.wealth,
+            self.happiness,
+            self.work_duration,
+            self.employed,
+            self.model.factory.wage,
+        )
 
     def consume(self):
         # 模拟必需品的消费，避免工厂不生产时，工人没有消费
-        self.wealth -= 1
+        self.wealth -= self.living_cost
         # 花钱购买产品 消费会增加Happiness
-        price = self.model.market.prices
-        self.relative_wealth = self.wealth / price
-        need = random.randint(1, 2)
-        if self.wealth - price * need >= 0 and self.model.factory.inventory > need:
-            self.wealth -= price * need
-            self.model.market.sell(need)
-            self.model.factory.inventory -= need
-            self.model.factory.wealth += price * need
-            self.model.market.daily_sales += need
-            self.model.market.monthly_sales += need
-            self.happiness += 5
-            logging.debug(
-                f"Worker {self.unique_id} bought product at price {price:.1f}"
-            )
-        elif self.model.factory.inventory < need:
-            self.happiness -= 9
-            logging.debug(f"Worker {self.unique_id} cannot find product in market")
-            return
-        else:
-            self.happiness -= 5
-            logging.debug(
-                f"Worker {self.unique_id} cannot afford product at price {price:.1f}"
-            )
-            return
+        price = self.model.current_price
+        # 写回原来的那一列，不每天新分配数组
+        np.divide(self.wealth, price, out=self.relative_wealth)
+        need = self.rng.integers(1, self.max_need, size=self.n, endpoint=True)
+        cost = price * need
+        affordable = self.wealth - cost >= 0
+        # 工人依次购买，每个人看到的是前面的人买完之后剩下的库存
+        # (每件产品在库存上记两次，见CrisisModel._settle_market)
+        wanted = np.where(affordable, need, 0)
+        stock = self.model.current_inventory - 2 * (np.cumsum(wanted) - wanted)
+        bought = affordable & (stock > need)
+        failed = np.flatnonzero(affordable & ~bought)
+        if failed.size:
+            # 第一次缺货之后，没买成的人不再占库存，剩下的库存(不超过max_need)
+            # 按顺序找下一个买得起、库存也够的人
+            pos = failed[0]
+            left = stock[pos]
+            bought[pos:] = False
+            while True:
+                stock[pos:] = left
+                later = np.flatnonzero(affordable[pos:] & (need[pos:] < left))
+                if not later.size:
+                    break
+                pos += later[0]
+                bought[pos] = True
+                left -= 2 * need[pos]
+                pos += 1
+        self.happiness += np.where(
+            bought,
+            5,
+            np.where(stock < need, -self.out_of_stock_penalty, -self.unaffordable_penalty),
+        )
+        self.wealth[bought] -= cost[bought]
+        # 库存和销量由模型在当天统一结算
+        np.multiply(need, bought, out=self.purchases)
 
-    def step(self):
-        self.choose_factory()
-        self.work()
-        self.consume()
 
+class Worker:
+    """WorkerPool中单个工人的视图，状态都存放在pool的数组里"""
+
+    __slots__ = (
+        "unique_id",
+        "model",
+        "pos",
+        "home_pos",
+        "pool",
+        "idx",
+        "factory",
+        "roster_idx",
+        "consumption_cycle",
+        "last_consumption",
+    )
+
+    wealth = _column("wealth")
+    relative_wealth = _column("relative_wealth")
+    employed = _column("employed")
+    work_duration = _column("work_duration")
+    happiness = _column("happiness")
+
+    def __init__(self, unique_id, model, pos, pool, idx):
+        self.unique_id = unique_id
+        self.model = model
+        self.pos = None
+        self.home_pos = pos
+        self.pool = pool
+        self.idx = idx
+        self.factory = None
+        self.roster_idx = -1  # 在factory.workers中的位置
+        self.consumption_cycle = 1
+        self.last_consumption = 0
+
+    def __str__(self):
+        return f"Worker {self.unique_id}: Wealth={self.wealth:.1f}, Employed={self.employed}"
+
+
+class Factory:
+    __slots__ = (
+        "unique_id",
+        "model",
+        "pos",
+        "wage",
+        "target_monthly_production",
+        "daily_production",
+        "last_daily_production",
+        "monthly_production",
+        "last_monthly_production",
+        "inventory",
+        "workers",
+        "hiring",
+        "wealth",
+        "inventory_ratio",
+        "job_offer",
+        "adjust_production",
+    )
 
-class Factory(mesa.Agent):
     def __init__(self, unique_id, model, pos):
-        super().__init__(unique_id, model)
+        self.unique_id = unique_id
+        self.model = model
+        params = VARIANTS[model.variant]
         self.pos = pos
-        self.wage = 50
+        self.wage = params["wage"]
         self.target_monthly_production = 0
         self.daily_production = 0
         self.last_daily_production = 0
@@ -105,115 +281,183 @@ class Factory(mesa.Agent):
         self.workers = []
         self.hiring = True
         self.wealth = 0
-        self.job_offer = 40
+        self.inventory_ratio = 10000  # 库存/上月销量，在produce中更新
+        self.job_offer = params["job_offer"]
+        # 按实验设定绑定具体行为，每天的step里不用再判断
+        if params["adjust_production"]:
+            self.adjust_production = self._adjust_production
+        else:
+            self.adjust_production = _skip
 
     def __str__(self):
         status = f"Production={self.production}, Workers={len(self.workers)}"
         return f"Factory status:({self.product_type.name}): {status}"
 
-    @property
-    def inventory_ratio(self):
-        if self.monthly_production == 0:
-            return 10000
-        return self.inventory / self.model.market.last_month_sales
+    def add_worker(self, worker):
+        worker.roster_idx = len(self.workers)
+        self.workers.append(worker)
 
-    def adjust_production(self):
-        self.wage = self.model.market.prices * 0.6 * 3
-        if self.model.schedule.steps % 30 != 0:
+    def remove_worker(self, worker):
+        # 用名单最后一个工人填补空位，避免list.remove的O(N)扫描
+        last = self.workers.pop()
+        if last is not worker:
+            self.workers[worker.roster_idx] = last
+            last.roster_idx = worker.roster_idx
+
+    def _fire(self, n):
+        # 一次切掉名单末尾的n个工人，在职状态按列一起改
+        if n <= 0:
+            return
+        fired = self.workers[-n:]
+        del self.workers[-n:]
+        self.model.pool.employed[[worker.idx for worker in fired]] = False
+        for worker in fired:
+            worker.factory = None
+
+    def update_inventory_ratio(self):
+        last_month_sales = self.model.market.last_month_sales
+        if self.monthly_production == 0 or last_month_sales == 0:
+            self.inventory_ratio = 10000
+        else:
+            self.inventory_ratio = self.inventory / last_month_sales
+
+    def _adjust_production(self):
+        market = self.model.market
+        self.wage = market.prices * 0.6 * 3
+        if not self.model.is_month_boundary:
             return
         self.last_monthly_production = self.monthly_production
         self.monthly_production = 0
-        sold_ratio = min(
-            1,
-            self.model.market.last_month_sales / (self.last_monthly_production + 1e-5),
-        )
-        adjustment = 0.5 + 0.6 * sold_ratio
-
-        if adjustment == 1.05:
-            self.job_offer += 2
-        elif adjustment > 1.05:
-            self.job_offer += 1
-        elif adjustment < 0.9 and adjustment > 0.7:
-            self.job_offer -= 1
-            if self.job_offer < len(self.workers):
-                for _ in range(len(self.workers) - self.job_offer):
-                    worker = self.workers.pop()
-                    worker.employed = False
-                    worker.factory = None
-        elif adjustment < 0.7:
-            self.job_offer -= 2
-            if self.job_offer < len(self.workers):
-                for _ in range(len(self.workers) - self.job_offer):
-                    worker = self.workers.pop()
-                    worker.employed = False
-                    worker.factory = None
-        if self.inventory_ratio > 3:
-            self.job_offer -= 2
-            if self.job_offer < len(self.workers):
-                for _ in range(len(self.workers) - self.job_offer):
-                    worker = self.workers.pop()
-                    worker.employed = False
-                    worker.factory = None
-
-        logging.info(
-            f"Factory {self.unique_id} adjusted production ratio: {adjustment}  "
+        self.inventory_ratio = 10000  # 本月产量清零
+        self.job_offer, adjustment = job_offer_update(
+            self.job_offer,
+            market.last_month_sales,
+            self.last_monthly_production,
+            self.inventory_ratio,
         )
+        # 岗位比现有工人少时，从名单末尾裁员
+        self._fire(len(self.workers) - self.job_offer)
+
+        log.info("Factory %s adjusted production ratio: %s", self.unique_id, adjustment)
 
     def produce(self):
-        if len(self.workers) == 0:
-            return
-        self.wealth -= 5 * self.job_offer + 100
-        self.last_daily_production = self.daily_production
-        self.daily_production = 0
-        for worker in self.workers:
-            self.daily_production += int(0.5 * worker.work_duration)
-            self.wealth -= self.wage
-        self.inventory += self.daily_production
-        self.monthly_production += self.daily_production
+        if len(self.workers) > 0:
+            self.wealth -= 5 * self.job_offer + 100
+            self.last_daily_production = self.daily_production
+            pool = self.model.pool
+            self.daily_production, wage_bill = produce_kernel(
+                pool.work_duration, pool.employed, self.wage
+            )
+            self.wealth -= wage_bill
+            self.inventory += self.daily_production
+            self.monthly_production += self.daily_production
+        self.update_inventory_ratio()
 
     def step(self):
         self.adjust_production()
         self.produce()
 
 
-class Government(mesa.Agent):
+class Government:
+    __slots__ = ("unique_id", "model", "pos", "last_intervention", "intervene")
+
     def __init__(self, unique_id, model):
-        super().__init__(unique_id, model)
+        self.unique_id = unique_id
+        self.model = model
+        self.pos = None
         self.last_intervention = 0
+        # 按实验设定绑定具体的政策
+        self.intervene = {
+            "reset_prices": self._reset_prices,
+            "reset_market": self._reset_market,
+            "stimulus": self._stimulate,
+        }[VARIANTS[model.variant]["intervention"]]
+
+    def _reset_prices(self):
+        self.model.market.prices = 20
 
-    def intervene(self):
+    def _reset_market(self):
+        self.model.factory.inventory *= 0.01
+        self.model.factory.wage = 30
+        self.model.factory.hiring = True
         self.model.market.prices = 20
+        self.model.factory.job_offer = 40
+
+    def _stimulate(self):
+        current_step = self.model.steps
+        if current_step - self.last_intervention < 60:  # 至少60天间隔
+            return
+        pool = self.model.pool
+        log.debug("model workers number: %s", pool.n)
+        unemployment = 1.0 - len(self.model.factory.workers) / pool.n
+        # 模型里只有一个工厂
+        avg_inventory = self.model.factory.inventory_ratio
+
+        crisis_level = sum([unemployment > 0.2, avg_inventory > 1.5])
+
+        if crisis_level >= 2:
+            self.last_intervention = current_step
+
+            # 财政刺激
+            stimulus = 500 * pool.n
+            pool.wealth += 500
+
+            log.warning(
+                "=== GOVERNMENT INTERVENTION === "
+                "Unemployment: %.1f%%, Inventory: %.1f, Stimulus: %.1f",
+                unemployment * 100,
+                avg_inventory,
+                stimulus,
+            )
 
     def step(self):
         self.intervene()
 
 
-class Market(mesa.Agent):
+class Market:
+    __slots__ = (
+        "unique_id",
+        "model",
+        "pos",
+        "prices",
+        "min_price",
+        "monthly_sales",
+        "daily_sales",
+        "last_month_sales",
+        "last_daily_sales",
+        "update_prices",
+    )
+
     def __init__(self, unique_id, model):
-        super().__init__(unique_id=unique_id, model=model)
+        self.unique_id = unique_id
         self.model = model
+        self.pos = None
         self.prices = 20
         self.min_price = 1
         self.monthly_sales = 0
         self.daily_sales = 0
         self.last_month_sales = 3750
         self.last_daily_sales = 125
+        # 按实验设定绑定具体行为，每天的step里不用再判断
+        if VARIANTS[model.variant]["update_prices"]:
+            self.update_prices = self._update_prices
+        else:
+            self.update_prices = _skip
 
-    def update_prices(self):
+    def _update_prices(self):
         supply = max(0, self.model.factory.inventory)
+        self.prices = price_update(
+            self.prices, self.last_daily_sales, supply, self.min_price
+        )
 
-        if supply == 0:
-            self.prices *= 2
-        else:
-            balance = self.last_daily_sales / supply
-            self.prices *= 0.95 + 0.05 * balance
-        self.prices = max(self.min_price, self.prices)
-
-        logging.info(f"Market prices : {self.prices}")
+        # 价格每天都变，日志里只按月记录一次
+        if self.model.is_month_boundary:
+            log.info("Market prices : %s", self.prices)
 
     def sell(self, quantity):
-        self.model.factory.inventory -= quantity
-        self.model.factory.wealth += quantity * self.prices
+        factory = self.model.factory
+        factory.inventory -= quantity
+        factory.wealth += quantity * self.prices
         self.daily_sales += quantity
         self.monthly_sales += quantity
 
@@ -221,6 +465,6 @@ class Market(mesa.Agent):
         self.update_prices()
         self.last_daily_sales = self.daily_sales
         self.daily_sales = 0
-        if self.model.steps % 30 == 0:
+        if self.model.is_month_boundary:
             self.last_month_sales = self.monthly_sales
             self.monthly_sales = 0
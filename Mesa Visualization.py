@@ -1,109 +1,182 @@
-from mesa import Agent, Model
+from mesa import Model
 from mesa.space import MultiGrid
 from mesa.time import RandomActivation
 from mesa.visualization.modules import CanvasGrid, ChartModule
 from mesa.visualization.ModularVisualization import ModularServer
 from mesa.datacollection import DataCollector
-import random
+import numpy as np
+
+# 阶级用整数表示，比较时不用比字符串
+PROLETARIAT = 0
+BOURGEOISIE = 1
 
 # --------------------------
 # Agent Definitions
 # --------------------------
-class SocialAgent(Agent):
-    def __init__(self, unique_id, model, agent_type, wealth=None, generation=0):
-        super().__init__(unique_id, model)
+class SocialAgent:
+    __slots__ = (
+        "unique_id",
+        "model",
+        "pos",
+        "agent_type",
+        "generation",
+        "wealth",
+        "reproduce_timer",
+        "age",
+        "max_age",
+        "list_idx",
+    )
+
+    def __init__(self, unique_id, model, agent_type, wealth=None, generation=0, max_age=None):
+        self.unique_id = unique_id
+        self.model = model
+        self.pos = None
         self.agent_type = agent_type
         self.generation = generation
         if wealth is not None:
             self.wealth = wealth
         else:
-            self.wealth = random.randint(4000, 6000) if agent_type == 'bourgeoisie' else random.randint(1, 5)
+            self.wealth = self.random.randint(4000, 6000) if agent_type == BOURGEOISIE else self.random.randint(1, 5)
         self.reproduce_timer = 0
         self.age = 0
-        self.max_age = random.randint(100, 150) if agent_type == 'bourgeoisie' else random.randint(60, 100)
+        self.list_idx = None  # 在模型按阶级维护的名单里的位置
+        if max_age is not None:
+            self.max_age = max_age
+        else:
+            self.max_age = self.random.randint(100, 150) if agent_type == BOURGEOISIE else self.random.randint(60, 100)
+
+    @property
+    def random(self):
+        # 和mesa.Agent一样使用模型的随机数生成器
+        return self.model.random
+
+    def _adjust_wealth(self, delta):
+        # 修改财富的同时更新模型上按阶级累计的总财富
+        self.wealth += delta
+        if self.agent_type == PROLETARIAT:
+            self.model.sum_wealth_prol += delta
+        else:
+            self.model.sum_wealth_bourg += delta
 
     def step(self):
         self.age += 1
         # 如果代理死亡，移除它
         if self.age >= self.max_age:
-            if self.pos:
-                self.model.grid.remove_agent(self)
-                self.model.schedule.remove(self)
-                self.model.occupied_positions.discard(self.pos)
+            self.model.remove_agent(self)
+            self.model.schedule.remove(self)
+            self.model.uncount_agent(self)
             return
 
-        neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False)
-
-        if self.agent_type == "bourgeoisie":
-            proletariat_neighbors = [n for n in neighbors if n.agent_type == "proletariat"]
-            for neighbor in proletariat_neighbors:
-                if neighbor.wealth > 0:
-                    neighbor.wealth -= 1
-                    multiplier = 1.0 + 0.1 * self.generation
-                    self.wealth += int(100 * multiplier)
-                else:
-                    self.wealth = max(0, self.wealth - 10)
+        # 先用占用数组数一下周围的无产者，需要时才取出邻居对象
+        num_prol_around = self.model.count_proletariat_around(self.pos)
+        neighbors = ()
+        if num_prol_around >= (1 if self.agent_type == BOURGEOISIE else 3):
+            neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False)
+
+        if self.agent_type == BOURGEOISIE:
+            proletariat_neighbors = [n for n in neighbors if n.agent_type == PROLETARIAT]
+            gain = int(100 * (1.0 + 0.1 * self.generation))
+            payers = [n for n in proletariat_neighbors if n.wealth > 0]
+            for neighbor in payers:
+                neighbor._adjust_wealth(-1)
+            num_broke = len(proletariat_neighbors) - len(payers)
+            if self.wealth >= 10 * num_broke:
+                # 财富不会降到0以下，收支可以一次结算
+                self._adjust_wealth(gain * len(payers) - 10 * num_broke)
+            else:
+                # 否则按邻居顺序逐个结算，和扣到0为止的规则保持一致
+                for neighbor in proletariat_neighbors:
+                    if neighbor in payers:
+                        self._adjust_wealth(gain)
+                    else:
+                        self._adjust_wealth(-min(10, self.wealth))
 
             if self.wealth > 10000:
-                self.wealth -= 100
+                self._adjust_wealth(-100)
 
             if self.wealth > 20000:
                 redistribution_amount = self.wealth // 2
-                self.wealth -= redistribution_amount
-                proletariat_agents = [a for a in self.model.schedule.agents if a.agent_type == 'proletariat']
-                for agent in proletariat_agents:
-                    agent.wealth += redistribution_amount // len(proletariat_agents)
-
-        elif self.agent_type == "proletariat":
-            empty_cells = [cell for cell in self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
-                           if self.model.grid.is_cell_empty(cell)]
+                self._adjust_wealth(-redistribution_amount)
+                proletariat_agents = self.model.prol_list
+                if proletariat_agents:
+                    # 每人分到的份额相同，总财富计数一次加上
+                    share = redistribution_amount // len(proletariat_agents)
+                    for agent in proletariat_agents:
+                        agent.wealth += share
+                    self.model.sum_wealth_prol += share * len(proletariat_agents)
+
+        elif self.agent_type == PROLETARIAT:
+            empty_cells = self.model.empty_cells_around(self.pos)
             if empty_cells:
                 new_pos = self.random.choice(empty_cells)
-                self.model.grid.move_agent(self, new_pos)
+                self.model.move_agent(self, new_pos)
 
-            fellow_proletariats = [n for n in neighbors if n.agent_type == "proletariat"]
+            fellow_proletariats = [n for n in neighbors if n.agent_type == PROLETARIAT]
             if len(fellow_proletariats) >= 3:
-                self.wealth += 1
+                self._adjust_wealth(1)
                 for neighbor in fellow_proletariats:
-                    neighbor.wealth += 1
+                    neighbor._adjust_wealth(1)
 
             if self.wealth >= 100:
-                self.agent_type = "bourgeoisie"
-                self.wealth = random.randint(4000, 6000)
-                self.max_age = random.randint(100, 150)
+                # 晋升时把计数从无产阶级挪到资产阶级
+                self.model.uncount_agent(self)
+                self.model.prol_grid[self.pos] -= 1
+                self.agent_type = BOURGEOISIE
+                self.wealth = self.random.randint(4000, 6000)
+                self.model.count_agent(self)
+                self.model.bourg_grid[self.pos] += 1
+                self.max_age = self.random.randint(100, 150)
                 self.model.promotions += 1  # 记录晋升人数
 
         self.reproduce_timer += 1
         if self.reproduce_timer >= 10:
             self.reproduce_timer = 0
-            if self.agent_type == "proletariat":
-                num_children = random.choice([1, 2, 3])
+            if self.agent_type == PROLETARIAT:
+                num_children = self.random.choice([1, 2, 3])
             else:
-                num_children = random.choice([0, 1])
+                num_children = self.random.choice([0, 1])
 
             for _ in range(num_children):
                 new_id = self.model.next_id()
                 child_type = self.agent_type
-                child_wealth = self.wealth // 10 if child_type == "bourgeoisie" else random.randint(1, 3)
+                child_wealth = self.wealth // 10 if child_type == BOURGEOISIE else self.random.randint(1, 3)
                 child = SocialAgent(new_id, self.model, child_type, wealth=child_wealth, generation=self.generation + 1)
-                self.model.schedule.add(child)
-                empty = [cell for cell in self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
-                         if self.model.grid.is_cell_empty(cell)]
+                # 周围没有空格时孩子无处安放，不加入模型
+                empty = self.model.empty_cells_around(self.pos)
                 if empty:
                     pos = self.random.choice(empty)
-                    self.model.grid.place_agent(child, pos)
-                    self.model.occupied_positions.add(pos)
+                    self.model.schedule.add(child)
+                    self.model.count_agent(child)
+                    self.model.place_agent(child, pos)
 
 # --------------------------
 # Model Definition
 # --------------------------
 class ClassConflictModel(Model):
-    def __init__(self, width, height, num_proletariat, num_bourgeoisie):
+    def __init__(self, width, height, num_proletariat, num_bourgeoisie, seed=None):
+        # Mesa只在seed按关键字传入时才给self.random设种子，这里统一设一次
+        self.reset_randomizer(seed)
         self.grid = MultiGrid(width, height, torus=True)
         self.schedule = RandomActivation(self)
-        self.occupied_positions = set()
+        self.rng = np.random.default_rng(seed)
         self.agent_count = 0
 
+        # 按阶级维护的名单和总财富，报告函数直接读取
+        self.prol_list = []
+        self.bourg_list = []
+        self.sum_wealth_prol = 0
+        self.sum_wealth_bourg = 0
+
+        # 每个格子上两个阶级的人数，邻域统计用数组切片完成
+        self.prol_grid = np.zeros((width, height), dtype=np.int16)
+        self.bourg_grid = np.zeros((width, height), dtype=np.int16)
+        # 环面上x的邻域下标就是 _wrap_x[x:x + 3]
+        self._wrap_x = np.arange(-1, width + 1) % width
+        self._wrap_y = np.arange(-1, height + 1) % height
+        # 初始放置时add_agent从这里取空格，放完就删掉
+        self._free_cells = list(np.ndindex(width, height))
+        self.random.shuffle(self._free_cells)
+
         # 记录晋升和降级
         self.promotions = 0
         self.demotions = 0
@@ -121,69 +194,120 @@ class ClassConflictModel(Model):
             }
         )
 
-        for _ in range(num_proletariat):
-            agent = SocialAgent(self.next_id(), self, "proletariat")
+        # 初始人口的财富和寿命一次性抽好
+        prol_wealth = self.rng.integers(1, 5, num_proletariat, endpoint=True)
+        prol_age = self.rng.integers(60, 100, num_proletariat, endpoint=True)
+        for wealth, max_age in zip(prol_wealth.tolist(), prol_age.tolist()):
+            agent = SocialAgent(self.next_id(), self, PROLETARIAT, wealth=wealth, max_age=max_age)
             self.add_agent(agent)
 
-        for _ in range(num_bourgeoisie):
-            agent = SocialAgent(self.next_id(), self, "bourgeoisie")
+        bourg_wealth = self.rng.integers(4000, 6000, num_bourgeoisie, endpoint=True)
+        bourg_age = self.rng.integers(100, 150, num_bourgeoisie, endpoint=True)
+        for wealth, max_age in zip(bourg_wealth.tolist(), bourg_age.tolist()):
+            agent = SocialAgent(self.next_id(), self, BOURGEOISIE, wealth=wealth, max_age=max_age)
             self.add_agent(agent)
+        del self._free_cells
 
     def add_agent(self, agent):
         self.schedule.add(agent)
-        while True:
-            x = self.random.randrange(self.grid.width)
-            y = self.random.randrange(self.grid.height)
-            if (x, y) not in self.occupied_positions:
-                self.occupied_positions.add((x, y))
-                break
-        self.grid.place_agent(agent, (x, y))
+        self.count_agent(agent)
+        # 从打乱的空格列表末尾取
+        pos = self._free_cells.pop()
+        self.place_agent(agent, pos)
+
+    def _type_grid(self, agent):
+        return self.prol_grid if agent.agent_type == PROLETARIAT else self.bourg_grid
+
+    def place_agent(self, agent, pos):
+        self.grid.place_agent(agent, pos)
+        self._type_grid(agent)[pos] += 1
+
+    def move_agent(self, agent, pos):
+        type_grid = self._type_grid(agent)
+        type_grid[agent.pos] -= 1
+        type_grid[pos] += 1
+        self.grid.move_agent(agent, pos)
+
+    def remove_agent(self, agent):
+        pos = agent.pos
+        self.grid.remove_agent(agent)
+        self._type_grid(agent)[pos] -= 1
+
+    def _around(self, pos):
+        x, y = pos
+        return self._wrap_x[x:x + 3], self._wrap_y[y:y + 3]
+
+    def count_proletariat_around(self, pos):
+        xs, ys = self._around(pos)
+        # 3x3的和包含中心格，要减掉中心格上的人
+        return int(self.prol_grid[np.ix_(xs, ys)].sum()) - int(self.prol_grid[pos])
+
+    def empty_cells_around(self, pos):
+        # 顺序和grid.get_neighborhood一致，保证随机选择的结果不变
+        xs, ys = self._around(pos)
+        occupied = self.prol_grid[np.ix_(xs, ys)] + self.bourg_grid[np.ix_(xs, ys)]
+        occupied[1, 1] = 1
+        return [(int(xs[i]), int(ys[j])) for i, j in np.argwhere(occupied == 0)]
+
+    def count_agent(self, agent):
+        if agent.agent_type == PROLETARIAT:
+            members = self.prol_list
+            self.sum_wealth_prol += agent.wealth
+        else:
+            members = self.bourg_list
+            self.sum_wealth_bourg += agent.wealth
+        agent.list_idx = len(members)
+        members.append(agent)
+
+    def uncount_agent(self, agent):
+        if agent.agent_type == PROLETARIAT:
+            members = self.prol_list
+            self.sum_wealth_prol -= agent.wealth
+        else:
+            members = self.bourg_list
+            self.sum_wealth_bourg -= agent.wealth
+        # 用名单最后一个代理填补空位
+        last = members.pop()
+        if last is not agent:
+            members[agent.list_idx] = last
+            last.list_idx = agent.list_idx
 
     def next_id(self):
         self.agent_count += 1
         return self.agent_count
 
     def step(self):
-        # 在每次步骤中清理死亡代理
-        dead_agents = [agent for agent in self.schedule.agents if agent.age >= agent.max_age]
-        for agent in dead_agents:
-            self.schedule.remove(agent)
-            self.grid.remove_agent(agent)
-            self.occupied_positions.discard(agent.pos)
-
+        # 代理到寿命时在自己的step里移除，这里不用再扫描一遍
         self.schedule.step()
         self.datacollector.collect(self)
         self.promotions = 0
         self.demotions = 0
 
     def get_num_proletariat(self):
-        return sum(1 for agent in self.schedule.agents if agent.agent_type == "proletariat")
+        return len(self.prol_list)
 
     def get_num_bourgeoisie(self):
-        return sum(1 for agent in self.schedule.agents if agent.agent_type == "bourgeoisie")
+        return len(self.bourg_list)
 
     def get_average_proletariat_wealth(self):
-        proletariats = [agent for agent in self.schedule.agents if agent.agent_type == "proletariat"]
-        return sum(p.wealth for p in proletariats) / len(proletariats) if proletariats else 0
+        return self.sum_wealth_prol / len(self.prol_list) if self.prol_list else 0
 
     def get_average_bourgeoisie_wealth(self):
-        bourgeoisie = [agent for agent in self.schedule.agents if agent.agent_type == "bourgeoisie"]
-        return sum(b.wealth for b in bourgeoisie) / len(bourgeoisie) if bourgeoisie else 0
+        return self.sum_wealth_bourg / len(self.bourg_list) if self.bourg_list else 0
 
     def get_proletariat_ratio(self):
-        total = len(self.schedule.agents)
-        return self.get_num_proletariat() / total if total > 0 else 0
+        total = len(self.prol_list) + len(self.bourg_list)
+        return len(self.prol_list) / total if total > 0 else 0
 
     def get_wealth_ratio(self):
-        total_wealth = sum(agent.wealth for agent in self.schedule.agents)
-        proletariat_wealth = sum(agent.wealth for agent in self.schedule.agents if agent.agent_type == "proletariat")
-        return proletariat_wealth / total_wealth if total_wealth > 0 else 0
+        total_wealth = self.sum_wealth_prol + self.sum_wealth_bourg
+        return self.sum_wealth_prol / total_wealth if total_wealth > 0 else 0
 
 # --------------------------
 # Visualization
 # --------------------------
 def agent_portrayal(agent):
-    if agent.agent_type == "proletariat":
+    if agent.agent_type == PROLETARIAT:
         color = "red"
     else:
         color = "blue"
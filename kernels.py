@@ -0,0 +1,86 @@
+"""工人、工厂和市场每天的数值计算内核
+
+装了numba时这些内核用@njit编译成机器码，一次循环处理所有工人；
+没有numba时退回到等价的NumPy向量化实现。
+价格和岗位每天只算一次，编译得不偿失，保持为普通Python函数。
+消费要按顺序扣减库存，所以仍然在WorkerPool.consume里用前缀和完成。
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba是可选依赖
+    njit = None
+
+
+def _work_numpy(wealth, happiness, work_duration, employed, wage):
+    # 不工作的工人幸福值上升，工作的工人幸福值下降
+    happiness += np.where(employed, -1, 3)
+    work_duration[employed] = 8
+
+    # 获得收入
+    wealth[employed] += wage
+
+
+def _work_loop(wealth, happiness, work_duration, employed, wage):
+    for i in range(wealth.shape[0]):
+        if employed[i]:
+            happiness[i] -= 1
+            work_duration[i] = 8
+            wealth[i] += wage
+        else:
+            happiness[i] += 3
+
+
+def _produce_numpy(work_duration, employed, wage):
+    """返回 (当天产量, 当天工资支出)"""
+    n_workers = np.count_nonzero(employed)
+    production = int((0.5 * work_duration[employed]).astype(np.int64).sum())
+    return production, wage * n_workers
+
+
+def _produce_loop(work_duration, employed, wage):
+    production = 0
+    wage_bill = 0.0
+    # 按工人顺序累加，同一个seed的结果逐位可复现
+    for i in range(work_duration.shape[0]):
+        if employed[i]:
+            production += int(0.5 * work_duration[i])
+            wage_bill += wage
+    return production, wage_bill
+
+
+def price_update(prices, last_daily_sales, supply, min_price):
+    """返回新的价格"""
+    # 没有库存时价格翻倍，否则按昨天的销量和库存之比调整
+    if supply == 0:
+        multiplier = 2.0
+    else:
+        multiplier = 0.95 + 0.05 * last_daily_sales / supply
+    return max(min_price, prices * multiplier)
+
+
+def job_offer_update(job_offer, last_month_sales, last_monthly_production, inventory_ratio):
+    """返回 (新的岗位数, 产量调整系数)，裁员由调用方按岗位数处理"""
+    sold_ratio = min(1.0, last_month_sales / (last_monthly_production + 1e-5))
+    adjustment = 0.5 + 0.6 * sold_ratio
+
+    # 卖得好就多招人，卖得差就减岗位
+    if adjustment > 1.05:
+        job_offer += 1
+    elif 0.7 < adjustment < 0.9:
+        job_offer -= 1
+    elif adjustment < 0.7:
+        job_offer -= 2
+    if inventory_ratio > 3:
+        job_offer -= 2
+    return job_offer, adjustment
+
+
+if njit is None:
+    work_kernel = _work_numpy
+    produce_kernel = _produce_numpy
+else:
+    work_kernel = njit(cache=True)(_work_loop)
+    produce_kernel = njit(cache=True)(_produce_loop)
@@ -5,9 +5,11 @@ import matplotlib.pyplot as plt
 import numpy as np
 from Agents import (
     Worker,
+    WorkerPool,
     Factory,
     Government,
     Market,
+    VARIANTS,
 )
 
 # 设置日志系统
@@ -22,25 +24,23 @@ logging.basicConfig(
 
 
 class CrisisModel(mesa.Model):
-    def __init__(self, N=5, width=20, height=20):
+    def __init__(self, N=5, width=20, height=20, seed=None, max_steps=365, variant="crisis"):
         super().__init__()
-        # 用来画图
-        self.time_steps = []
-        self.unemployment_rates = []
-        self.inventories = []
-        self.daily_gdps = []
-        self.daily_productions = []
-        self.avg_worker_wealths = []
-        self.factory_wealths = []
-        self.market_sales = []
-        self.avg_happiness = []
-        #
-
+        # 用来画图，每天一行，列的顺序见plot_statistics
+        self.stats = np.empty((max_steps, 8))
+        self.num_recorded = 0
+
+        # 整个模型共用一个随机数生成器，便于用seed复现
+        self.rng = np.random.default_rng(seed)
+        self.variant = variant  # 使用Agents.VARIANTS中的哪组参数
+        params = VARIANTS[variant]
+        self.intervention_interval = params["intervention_interval"]
+        self.report_phase = params["report_phase"]
         self.steps = 0
+        self.is_month_boundary = False  # 每30天为一个聘期/结算周期
         self.num_workers = N
         # self.grid = mesa.space.MultiGrid(width, height, True)
-        self.position_set = set()
-        self.schedule = mesa.time.SimultaneousActivation(self)
+        occupied = np.zeros((width, height), dtype=np.bool_)  # 格子是否已被占用
 
         logging.info("===== Initializing Economic Simulation =====")
 
@@ -48,22 +48,20 @@ class CrisisModel(mesa.Model):
         pos = (10, 10)
         self.factory = Factory(0, self, pos)
 
-        logging.info(f"Creating factory in {pos}")
-        self.position_set.add(pos)
+        logging.info("Creating factory in %s", pos)
+        occupied[pos] = True
 
-        # 创建工人
+        # 创建工人，工人的状态统一存放在pool里
+        self.pool = WorkerPool(self, self.num_workers)
         self.workers = list(range(self.num_workers))
-        for i in range(self.num_workers):
-            while True:
-                temp = (self.random.randrange(width), self.random.randrange(height))
-                if temp not in self.position_set:
-                    pos = temp
-                    self.position_set.add(pos)
-                    break
-            worker = Worker(i + 1, self, pos)
+        # 从空格子里不放回地抽出每个工人的位置，格子快占满时也不用反复重抽
+        free_cells = np.argwhere(~occupied)
+        chosen = self.rng.choice(len(free_cells), size=self.num_workers, replace=False)
+        for i, (x, y) in enumerate(free_cells[chosen].tolist()):
+            pos = (x, y)
+            worker = Worker(i + 1, self, pos, self.pool, i)
             self.workers[i] = worker
-            logging.info(f"Creating worker {i} at {pos}")
-            self.schedule.add(worker)
+            logging.info("Creating worker %s at %s", i, pos)
 
         # Create a government agent and a market
         self.gov = Government(10001, self)
@@ -71,34 +69,65 @@ class CrisisModel(mesa.Model):
 
     def step(self):
         self.steps += 1
-
-        logging.info(f"\n=== Day {self.steps} ===")
-
-        # 运行所有worker的step
-        self.schedule.step()
+        self.is_month_boundary = self.steps % 30 == 0
+
+        if self.intervention_interval and self.steps % self.intervention_interval == 0:
+            self.gov.intervene()
+        logging.info("\n=== Day %s ===", self.steps)
+
+        # 一天之内工人看到的价格和库存不变，先记下来
+        self.current_price = self.market.prices
+        self.current_inventory = self.factory.inventory
+        # 所有worker一起向量化地运行step
+        self.step_workers()
+        self._settle_market()
         self.factory.step()
         self.market.step()
         # 打印经济摘要
         self.print_summary()
 
+    def step_workers(self):
+        self.pool.choose_factory()
+        self.pool.work()
+        self.pool.consume()
+
+    def _settle_market(self):
+        # 把当天所有工人的购买一次性结算到市场和工厂
+        purchases = self.pool.purchases
+        sold = int(purchases.sum())
+        if sold:
+            # 原来每个工人先调用market.sell再直接扣一次库存，
+            # 库存、工厂收入和销量都记两次，这里保持同样的账目
+            self.market.sell(2 * sold)
+            logging.debug("Workers bought %s products at price %.1f", sold, self.market.prices)
+        purchases.fill(0)
+
     def print_summary(self):
-        unemployment = (
-            sum(
-                1
-                for a in self.schedule.agents
-                if isinstance(a, Worker) and not a.employed
-            )
-            / self.num_workers
-        )
+        pool = self.pool
+        # 只有一个工厂，在职人数就是工厂名单的长度
+        unemployment = 1 - len(self.factory.workers) / self.num_workers
         inventory = self.factory.inventory
         f = self.factory
         daily_gdp = f.daily_production * self.market.prices
-        average_worker_wealth = sum(
-            [w.wealth for w in self.schedule.agents if isinstance(w, Worker)]
-        ) / len([w for w in self.schedule.agents if isinstance(w, Worker)])
-        avg_happiness = sum(
-            [w.happiness for w in self.schedule.agents if isinstance(w, Worker)]
-        ) / len([w for w in self.schedule.agents if isinstance(w, Worker)])
+        average_worker_wealth = pool.wealth.mean()
+        avg_happiness = pool.happiness.mean()
+        if self.num_recorded == len(self.stats):
+            # 超过预计的天数时把缓冲区扩大一倍
+            self.stats = np.concatenate([self.stats, np.empty_like(self.stats)])
+        self.stats[self.num_recorded] = (
+            unemployment,
+            inventory,
+            daily_gdp,
+            f.daily_production,
+            average_worker_wealth,
+            f.wealth,
+            self.market.last_daily_sales,
+            avg_happiness,
+        )
+        self.num_recorded += 1
+        # 日志级别高于INFO时不用拼接摘要字符串
+        if not logging.getLogger().isEnabledFor(logging.INFO):
+            return
         logging.info(
             f"Economy Summary:\n"
             f"- Unemployment: {unemployment:.1%}\n"
@@ -110,15 +139,8 @@ class CrisisModel(mesa.Model):
             f"- Market daily sales: {self.market.last_daily_sales:.1f}\n"
             f"- Average happiness: {avg_happiness:.1f}\n"
         )
-        self.time_steps.append(self.steps)
-        self.unemployment_rates.append(unemployment)
-        self.inventories.append(inventory)
-        self.daily_gdps.append(daily_gdp)
-        self.daily_productions.append(f.daily_production)
-        self.avg_worker_wealths.append(average_worker_wealth)
-        self.factory_wealths.append(f.wealth)
-        self.market_sales.append(self.market.last_daily_sales)
-        self.avg_happiness.append(avg_happiness)
+        if not self.report_phase:
+            return
         # 检测经济周期阶段
         if unemployment < 0.05:
             phase = "Expansion"
@@ -127,27 +149,29 @@ class CrisisModel(mesa.Model):
         else:
             phase = "An economic crisis occurred!"
 
-        logging.info(f"Economic Phase: {phase}")
+        logging.info("Economic Phase: %s", phase)
 
     def plot_statistics(self):
         # 绘制数据图
         fig, axs = plt.subplots(4, 2, figsize=(15, 12))
 
+        stats = self.stats[: self.num_recorded]
+        time_steps = np.arange(1, self.num_recorded + 1)
         metrics = [
-            ("Unemployment Rate", self.unemployment_rates, "百分比"),
-            ("Inventory", self.inventories, "单位"),
-            ("Daily GDP", self.daily_gdps, "货币单位"),
-            ("Daily Production", self.daily_productions, "单位"),
-            ("Worker Wealth", self.avg_worker_wealths, "货币单位"),
-            ("Factory Wealth", self.factory_wealths, "货币单位"),
-            ("Market Sales", self.market_sales, ""),
-            ("Average Happiness", self.avg_happiness, "points"),
+            ("Unemployment Rate", stats[:, 0], "百分比"),
+            ("Inventory", stats[:, 1], "单位"),
+            ("Daily GDP", stats[:, 2], "货币单位"),
+            ("Daily Production", stats[:, 3], "单位"),
+            ("Worker Wealth", stats[:, 4], "货币单位"),
+            ("Factory Wealth", stats[:, 5], "货币单位"),
+            ("Market Sales", stats[:, 6], ""),
+            ("Average Happiness", stats[:, 7], "points"),
         ]
 
         for idx, (title, data, unit) in enumerate(metrics):
             row = idx // 2
             col = idx % 2
-            axs[row, col].plot(self.time_steps, data, "b-")
+            axs[row, col].plot(time_steps, data, "b-")
             axs[row, col].set_title(title)
             axs[row, col].set_xlabel("Time Step")
             axs[row, col].set_ylabel(unit)
@@ -158,9 +182,10 @@ class CrisisModel(mesa.Model):
         plt.show()
 
 
-def run_simulation():
-    model = CrisisModel(N=50)
-    for i in range(365):  # 模拟天数
+def run_simulation(variant="crisis", days=365):
+    # days为模拟天数
+    model = CrisisModel(N=50, max_steps=days, variant=variant)
+    for i in range(days):
         model.step()
     model.plot_statistics()  # 绘制统计图
 
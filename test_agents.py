@@ -0,0 +1,46 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from Agents import Factory, Government, WorkerPool
+
+
+def make_model(variant="perfect", n=10, steps=60):
+    # 只搭起Government用到的部分：工人、唯一的工厂和当前天数
+    model = SimpleNamespace(variant=variant, rng=np.random.default_rng(0), steps=steps)
+    model.pool = WorkerPool(model, n)
+    model.factory = Factory(0, model, (10, 10))
+    return model
+
+
+class StimulateTest(unittest.TestCase):
+    def test_stimulus_in_crisis(self):
+        model = make_model()
+        gov = Government(1, model)
+        wealth = model.pool.wealth.copy()
+        # 没有人被雇佣，库存比也很高，两个危机条件同时满足
+        self.assertEqual(len(model.factory.workers), 0)
+        self.assertGreater(model.factory.inventory_ratio, 1.5)
+
+        with self.assertLogs("Agents", level="WARNING"):
+            gov._stimulate()
+
+        np.testing.assert_array_equal(model.pool.wealth, wealth + 500)
+        self.assertEqual(gov.last_intervention, model.steps)
+
+    def test_stimulus_waits_60_days(self):
+        model = make_model()
+        gov = Government(1, model)
+        with self.assertLogs("Agents", level="WARNING"):
+            gov._stimulate()
+        wealth = model.pool.wealth.copy()
+
+        model.steps += 59
+        gov._stimulate()
+
+        np.testing.assert_array_equal(model.pool.wealth, wealth)
+
+
+if __name__ == "__main__":
+    unittest.main()